@@ -5,14 +5,494 @@ __description__ = 'Windows Shortcut file (LNK) parser'
 __author__ = 'Silas Cutler'
 __version__ = '0.2.1'
 
+import os
 import sys
+import copy
+import mmap
 import json
 import struct
 import datetime
 import argparse
 
+try:
+	from .overlay import scan_overlay
+except ImportError:
+	# Executed directly as a script rather than imported as a package
+	from overlay import scan_overlay
+
+
+# Define static constents used within the LNK format.  These are shared by
+# every parse and must never be modified.
+
+LINK_FLAGS = [
+	('HasTargetIDList', 0x00000001),
+	('HasLinkInfo', 0x00000002),
+	('HasName', 0x00000004),
+	('HasRelativePath', 0x00000008),
+	('HasWorkingDir', 0x00000010),
+	('HasArguments', 0x00000020),
+	('HasIconLocation', 0x00000040),
+	('IsUnicode', 0x00000080),
+	('ForceNoLinkInfo', 0x00000100),
+	('HasExpString', 0x00000200),
+	('RunInSeparateProcess', 0x00000400),
+	('Reserved0', 0x00000800),
+	('HasDarwinID', 0x00001000),
+	('RunAsUser', 0x00002000),
+	('HasExpIcon', 0x00004000),
+	('NoPidlAlias', 0x00008000),
+	('Reserved1', 0x00010000),
+	('RunWithShimLayer', 0x00020000),
+	('ForceNoLinkTrack', 0x00040000),
+	('EnableTargetMetadata', 0x00080000),
+	('DisableLinkPathTracking', 0x00100000),
+	('DisableKnownFolderTracking', 0x00200000),
+	('DisableKnownFolderAlias', 0x00400000),
+	('AllowLinkToLink', 0x00800000),
+	('UnaliasOnSave', 0x01000000),
+	('PreferEnvironmentPath', 0x02000000),
+	('KeepLocalIDListForUNCTarget', 0x04000000),
+]
+
+FILE_FLAGS = [
+	('FILE_ATTRIBUTE_READONLY', 0x00000001),
+	('FILE_ATTRIBUTE_HIDDEN', 0x00000002),
+	('FILE_ATTRIBUTE_SYSTEM', 0x00000004),
+	('Reserved, not used by the LNK format', 0x00000008),
+	('FILE_ATTRIBUTE_DIRECTORY', 0x00000010),
+	('FILE_ATTRIBUTE_ARCHIVE', 0x00000020),
+	('FILE_ATTRIBUTE_DEVICE', 0x00000040),
+	('FILE_ATTRIBUTE_NORMAL', 0x00000080),
+	('FILE_ATTRIBUTE_TEMPORARY', 0x00000100),
+	('FILE_ATTRIBUTE_SPARSE_FILE', 0x00000200),
+	('FILE_ATTRIBUTE_REPARSE_POINT', 0x00000400),
+	('FILE_ATTRIBUTE_COMPRESSED', 0x00000800),
+	('FILE_ATTRIBUTE_OFFLINE', 0x00001000),
+	('FILE_ATTRIBUTE_NOT_CONTENT_INDEXED', 0x00002000),
+	('FILE_ATTRIBUTE_ENCRYPTED', 0x00004000),
+	('Unknown (seen on Windows 95 FAT)', 0x00008000),
+	('FILE_ATTRIBUTE_VIRTUAL', 0x00010000),
+]
+
+DRIVE_TYPES = [
+	'DRIVE_UNKNOWN',
+	'DRIVE_NO_ROOT_DIR',
+	'DRIVE_REMOVABLE',
+	'DRIVE_FIXED',
+	'DRIVE_REMOTE',
+	'DRIVE_CDROM',
+	'DRIVE_RAMDISK',
+]
+HOTKEY_VALUES = {
+	'\x00': 'UNSET',
+	'\x01': 'HOTKEYF_SHIFT',
+	'\x02': 'HOTKEYF_CONTROL',
+	'\x03': 'HOTKEYF_ALT',
+}
+WINDOWSTYLES = [
+	'SW_HIDE',
+	'SW_NORMAL',
+	'SW_SHOWMINIMIZED',
+	'SW_MAXIMIZE ',
+	'SW_SHOWNOACTIVATE',
+	'SW_SHOW',
+	'SW_MINIMIZE',
+	'SW_SHOWMINNOACTIVE',
+	'SW_SHOWNA',
+	'SW_RESTORE',
+	'SW_SHOWDEFAULT',
+]
+
+
+def clean_line(rstring):
+	return ''.join(chr(i) for i in rstring if 128 > i > 20)
+
+
+def read_string(buf, index):
+	result = ''
+	while buf[index] != 0x00:
+		result += chr(buf[index])
+		index += 1
+	return result
+
+
+def read_stringData(buf, index, u_mult):
+	string_size = struct.unpack('<H', buf[index: index + 2])[0] * u_mult
+	string = clean_line(buf[index + 2: index + 2 + string_size].replace(b'\x00', b''))
+	new_index = index + string_size + 2
+	return new_index, string
+
+
+def enabled_flags_to_list(flags):
+	enabled = []
+	for flag in flags:
+		if flags[flag]:
+			enabled.append(flag)
+	return enabled
+
+
+def parse_flags(value, table):
+	return {name: bool(value & mask) for name, mask in table}
+
+
+def parse_lnk_header(buf, offset, lnk_header, debug=False):
+	# Parse the LNK file header into lnk_header
+	try:
+		# Header always starts with { 4c 00 00 00 } and is the size of the header
+		lnk_header['header_size'] = struct.unpack('<I', buf[offset:offset + 4])[0]
+
+		header = buf[offset:offset + lnk_header['header_size']]
+
+		lnk_header['guid'] = header[4:20].hex()
+
+		lnk_header['rlinkFlags'] = struct.unpack('<i', header[20:24])[0]
+		lnk_header['rfileFlags'] = struct.unpack('<i', header[24:28])[0]
+
+		lnk_header['creation_time'] = struct.unpack('<q', header[28:36])[0]
+		lnk_header['accessed_time'] = struct.unpack('<q', header[36:44])[0]
+		lnk_header['modified_time'] = struct.unpack('<q', header[44:52])[0]
+
+		lnk_header['file_size'] = struct.unpack('<i', header[52:56])[0]
+		lnk_header['rfile_size'] = header[52:56].hex()
+
+		lnk_header['icon_index'] = struct.unpack('<I', header[56:60])[0]
+		try:
+			if struct.unpack('<i', header[60:64])[0] < len(WINDOWSTYLES):
+				lnk_header['windowstyle'] = WINDOWSTYLES[
+					struct.unpack('<i', header[60:64])[0]]
+			else:
+				lnk_header['windowstyle'] = struct.unpack('<i', header[60:64])[0]
+		except Exception as e:
+			if debug:
+				print('Error Parsing WindowStyle in Header: %s' % e, file=sys.stderr)
+			lnk_header['windowstyle'] = struct.unpack('<i', header[60:64])[0]
+
+		try:
+			lnk_header['hotkey'] = '%s - %s {0x%s}' % (
+				HOTKEY_VALUES[chr(struct.unpack('<B', header[65:66])[0])],
+				clean_line(struct.unpack('<B', header[64:65])),
+				header[64:66].hex()
+			)
+
+			lnk_header['rhotkey'] = struct.unpack('<H', header[64:66])[0]
+		except Exception as e:
+			if debug:
+				print('Exception parsing HOTKEY part of header: %s' % e, file=sys.stderr)
+				print(header[65:66].hex(), file=sys.stderr)
+			lnk_header['hotkey'] = struct.unpack('<H', header[64:66])[0]
+
+		lnk_header['reserved0'] = struct.unpack('<H', header[66:68])[0]
+		lnk_header['reserved1'] = struct.unpack('<i', header[68:72])[0]
+		lnk_header['reserved2'] = struct.unpack('<i', header[72:76])[0]
+	except Exception as e:
+		if debug:
+			print('Exception parsing LNK Header: %s' % e, file=sys.stderr)
+		return False
+
+	if lnk_header['header_size'] == 76:
+		return True
+
+
+def parse_link_info(buf, index):
+	loc_information = {
+		'LinkInfoSize': struct.unpack('<i', buf[index: index + 4])[0],
+		'LinkInfoHeaderSize': struct.unpack('<i', buf[index + 4: index + 8])[0],
+		'LinkInfoFlags': struct.unpack('<i', buf[index + 8: index + 12])[0],
+		'VolumeIDOffset': struct.unpack('<i', buf[index + 12: index + 16])[0],
+		'LocalBasePathOffset': struct.unpack('<i', buf[index + 16: index + 20])[0],
+		'CommonNetworkRelativeLinkOffset': struct.unpack('<i', buf[index + 20: index + 24])[0],
+		'CommonPathSuffixOffset': struct.unpack('<i', buf[index + 24: index + 28])[0],
+	}
+
+	if loc_information['LinkInfoFlags'] & 0x0001:
+		if loc_information['LinkInfoHeaderSize'] >= 36:
+			loc_information['o_LocalBasePathOffsetUnicode'] = \
+					struct.unpack('<i', buf[index + 28: index + 32])[0]
+			local_index = index + loc_information['o_LocalBasePathOffsetUnicode']
+			loc_information['o_LocalBasePathUnicode'] = \
+					struct.unpack('<i', buf[local_index: local_index + 4])[0]
+		else:
+			local_index = index + loc_information['LocalBasePathOffset']
+			loc_information['LocalBasePath'] = read_string(buf, local_index)
+
+		local_index = index + loc_information['VolumeIDOffset']
+		loc_information['location'] = 'VolumeIDAndLocalBasePath'
+		loc_information['VolumeIDAndLocalBasePath'] = {
+			'VolumeIDSize':
+				struct.unpack('<i', buf[local_index + 0: local_index + 4])[0],
+			'rDriveType':
+				struct.unpack('<i', buf[local_index + 4: local_index + 8])[0],
+			'DriveSerialNumber': hex(
+				struct.unpack('<i', buf[local_index + 8: local_index + 12])[0]),
+			'VolumeLabelOffset':
+				struct.unpack('<i', buf[local_index + 12: local_index + 16])[0],
+		}
+
+		if loc_information['VolumeIDAndLocalBasePath']['rDriveType'] < len(DRIVE_TYPES):
+			loc_information['VolumeIDAndLocalBasePath']['DriveType'] = DRIVE_TYPES[loc_information['VolumeIDAndLocalBasePath']['rDriveType']]
+
+		if loc_information['VolumeIDAndLocalBasePath']['VolumeLabelOffset'] != 20:
+			length = loc_information['VolumeIDAndLocalBasePath']['VolumeIDSize'] - loc_information['VolumeIDAndLocalBasePath']['VolumeLabelOffset']
+			local_index = index + loc_information['VolumeIDOffset'] + loc_information['VolumeIDAndLocalBasePath']['VolumeLabelOffset']
+			loc_information['VolumeIDAndLocalBasePath']['VolumeLabel'] = clean_line(buf[local_index: local_index + length].replace(b'\x00', b''))
+		else:
+			loc_information['VolumeIDAndLocalBasePath']['o_VolumeLabelOffsetUnicode'] = struct.unpack('<i', buf[local_index + 16: local_index + 20])[0]
+			local_index = index + loc_information['VolumeIDOffset'] + loc_information['VolumeIDAndLocalBasePath']['o_VolumeLabelOffsetUnicode']
+			loc_information['VolumeIDAndLocalBasePath']['o_VolumeLabelUnicode'] = struct.unpack('<i', buf[local_index: local_index + 4])[0]
+
+	elif loc_information['LinkInfoFlags'] & 0x0002:
+		if loc_information['LinkInfoHeaderSize'] >= 36:
+			loc_information['o_CommonPathSuffixOffsetUnicode'] = \
+					struct.unpack('<i', buf[index + 28: index + 32])[0]
+			local_index = index + loc_information['o_CommonPathSuffixOffsetUnicode']
+			loc_information['o_CommonPathSuffixUnicode'] = struct.unpack('<i', buf[local_index: local_index + 4])[0]
+		else:
+			local_index = index + loc_information['CommonPathSuffixOffset']
+			loc_information['CommonPathSuffix'] = \
+					struct.unpack('<i', buf[local_index: local_index + 4])[0]
+
+		local_index = index + loc_information['CommonNetworkRelativeLinkOffset']
+		loc_information['location'] = 'CommonNetworkRelativeLinkAndPathSuffix'
+		loc_information['CommonNetworkRelativeLinkAndPathSuffix'] = {
+			'CommonNetworkRelativeLinkSize':
+				struct.unpack('<i', buf[local_index + 0: local_index + 4])[0],
+			'CommonNetworkRelativeLinkFlags':
+				struct.unpack('<i', buf[local_index + 4: local_index + 8])[0],
+			'NetNameOffset':
+				struct.unpack('<i', buf[local_index + 8: local_index + 12])[0],
+			'DeviceNameOffset':
+				struct.unpack('<i', buf[local_index + 12: local_index + 16])[0],
+			'NetworkProviderType':
+				struct.unpack('<i', buf[local_index + 16: local_index + 20])[0],
+		}
+
+		if loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_NetNameOffset'] > 20:
+			loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_NetNameOffsetUnicode'] = \
+			struct.unpack('<i', buf[local_index + 20: index + 24])[0]
+			local_index = index + loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_NetNameOffsetUnicode']
+			loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_NetNameOffsetUnicode'] = \
+				struct.unpack('<i', buf[local_index: local_index + 4])[0]
+
+			loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_DeviceNameOffsetUnicode'] = \
+			struct.unpack('<i', buf[local_index + 24: index + 28])[0]
+			local_index = loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_DeviceNameOffsetUnicode']
+			loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_DeviceNameOffsetUnicode'] = \
+				struct.unpack('<i', buf[local_index: local_index + 4])[0]
+		else:
+			local_index = index + loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_NetNameOffset']
+			loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_NetNameOffset'] = \
+				struct.unpack('<i', buf[local_index: local_index + 4])[0]
+
+			local_index = loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_DeviceNameOffset']
+			loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_DeviceNameOffset'] = \
+				struct.unpack('<i', buf[local_index: local_index + 4])[0]
+
+	return loc_information
+
+
+# ExtraData block parsers: (buf, index, size) -> (block name, block fields)
+
+def parse_environment_block(buf, index, size):
+	return 'ENVIRONMENTAL_VARIABLES_LOCATION_BLOCK', {
+		'size': size,
+		'variable_location': clean_line(buf[index + 8: index + 8 + size]),
+	}
+
+
+def parse_console_block(buf, index, size):
+	return 'CONSOLE_PROPERTIES_BLOCK', {}
+
+
+def parse_distributedTracker_block(buf, index, size):
+	return 'DISTRIBUTED_LINK_TRACKER_BLOCK', {
+		'size': struct.unpack('<I', buf[index + 8: index + 12])[0],
+		'version': struct.unpack('<I', buf[index + 12: index + 16])[0],
+		'machine_identifier': clean_line(buf[index + 16: index + 32]),
+		'droid_volume_identifier': buf[index + 32: index + 48].hex(),
+		'droid_file_identifier': buf[index + 48: index + 64].hex(),
+		'birth_droid_volume_identifier': buf[index + 64: index + 80].hex(),
+		'birth_droid_file_identifier': buf[index + 80: index + 96].hex(),
+	}
+
+
+def parse_codepage_block(buf, index, size):
+	return 'CONSOLE_CODEPAGE_BLOCK', {}
+
+
+def parse_specialFolder_block(buf, index, size):
+	return 'SPECIAL_FOLDER_LOCATION_BLOCK', {}
+
+
+def parse_darwin_block(buf, index, size):
+	return 'DARWIN_BLOCK', {}
+
+
+def parse_icon_block(buf, index, size):
+	return 'ICON_LOCATION_BLOCK', {}
+
+
+def parse_shimLayer_block(buf, index, size):
+	return 'SHIM_LAYER_BLOCK', {}
+
+
+def parse_metadata_block(buf, index, size):
+	return 'METADATA_PRPERTIES_BLOCK', {}
+
+
+def parse_knownFolder_block(buf, index, size):
+	return 'KNOWN_FOLDER_LOCATION_BLOCK', {}
+
+
+def parse_shellItem_block(buf, index, size):
+	return 'SHELL_ITEM_IDENTIFIER_BLOCK', {}
+
+
+def parse_vistaIDList_block(buf, index, size):
+	return 'VISTA_AND_ABOVE_IDLIST_BLOCK', {}
+
+
+# Each MAGIC string refernces a function for processing
+EXTRA_SIGS = {
+	'a0000001': parse_environment_block,
+	'a0000002': parse_console_block,
+	'a0000003': parse_distributedTracker_block,
+	'a0000004': parse_codepage_block,
+	'a0000005': parse_specialFolder_block,
+	'a0000006': parse_darwin_block,
+	'a0000007': parse_icon_block,
+	'a0000008': parse_shimLayer_block,
+	'a0000009': parse_metadata_block,
+	'a000000b': parse_knownFolder_block,
+	'a000000c': parse_shellItem_block,
+	'a000000a': parse_vistaIDList_block,
+}
+
+
+def parse(buf, offset=0, debug=False):
+	# Parse the LNK file starting at buf[offset].  buf may be bytes, an mmap
+	# or anything else supporting slicing; it is only ever read.  All state
+	# lives in the returned dict, so concurrent calls never interact.
+	res = {
+		'header': {},
+		'link_flags': {},
+		'file_flags': {},
+		'target': {
+			'size': 0,
+			'items': [],
+		},
+		'link_info': {},
+		'data': {},
+		'extra': {},
+		'overlay': {},
+		'valid_header': True,
+	}
+
+	lnk_header = res['header']
+	if not parse_lnk_header(buf, offset, lnk_header, debug):
+		res['valid_header'] = False
+		if debug:
+			print('Failed Header Check', file=sys.stderr)
+		# Without the flags nothing else can be located
+		if 'rfileFlags' not in lnk_header:
+			return res
+
+	res['link_flags'] = link_flags = parse_flags(lnk_header['rlinkFlags'], LINK_FLAGS)
+	res['file_flags'] = parse_flags(lnk_header['rfileFlags'], FILE_FLAGS)
+	lnk_header['linkFlags'] = enabled_flags_to_list(res['link_flags'])
+	lnk_header['fileFlags'] = enabled_flags_to_list(res['file_flags'])
+	index = offset + lnk_header['header_size']
+
+	# Parse ID List
+	if link_flags['HasTargetIDList']:
+		try:
+			res['target']['size'] = struct.unpack('<H', buf[index: index + 2])[0]
+			index += 2
+			index += res['target']['size']
+		except Exception as e:
+			if debug:
+				print('Exception parsing TargetIDList: %s' % e, file=sys.stderr)
+			return res
+
+	if link_flags['HasLinkInfo'] and link_flags['ForceNoLinkInfo'] == False:
+		try:
+			res['link_info'] = parse_link_info(buf, index)
+			index += (res['link_info']['LinkInfoSize'])
+		except Exception as e:
+			if debug:
+				print('Exception parsing Location information: %s' % e, file=sys.stderr)
+			return res
+
+	data = res['data']
+	try:
+		u_mult = 1
+		if link_flags['IsUnicode']:
+			u_mult = 2
+
+		if link_flags['HasName']:
+			data['description'] = read_stringData(buf, index, u_mult)
+
+		if link_flags['HasRelativePath']:
+			index, data['relativePath'] = read_stringData(buf, index, u_mult)
+
+		if link_flags['HasWorkingDir']:
+			index, data['workingDirectory'] = read_stringData(buf, index, u_mult)
+
+		if link_flags['HasArguments']:
+			index, data['commandLineArguments'] = read_stringData(buf, index, u_mult)
+
+		if link_flags['HasIconLocation']:
+			index, data['iconLocation'] = read_stringData(buf, index, u_mult)
+
+	except Exception as e:
+		if debug:
+			print('Exception in parsing data: %s' % e, file=sys.stderr)
+		return res
+
+	try:
+		while index + 4 <= len(buf):
+			try:
+				size = struct.unpack('<I', buf[index: index + 4])[0]
+				# TerminalBlock: anything after it is appended data
+				if size < 0x00000004:
+					index += 4
+					res['overlay'] = {
+						'offset': index,
+						'size': len(buf) - index,
+					}
+					break
+				if index + size > len(buf):
+					if debug:
+						print('EXTRABLOCK at %d runs past the end of the file' % index, file=sys.stderr)
+					break
+
+				# Blocks with an unknown signature are skipped using their size
+				sig = None
+				if size >= 8:
+					sig = str(hex(struct.unpack('<I', buf[index + 4: index + 8])[0]))[2:]
+				if sig in EXTRA_SIGS:
+					try:
+						name, block = EXTRA_SIGS[sig](buf, index, size)
+						res['extra'][name] = block
+					except Exception as e:
+						if debug:
+							print('Exception in EXTRABLOCK Parsing: %s ' % e, file=sys.stderr)
+				elif debug:
+					print('Unknown EXTRABLOCK signature %s at %d' % (sig, index), file=sys.stderr)
+
+				index += (size)
+			except Exception as e:
+				if debug:
+					print('Exception in EXTRABLOCK Parsing: %s ' % e, file=sys.stderr)
+				break
+	except Exception as e:
+		if debug:
+			print('Exception in EXTRABLOCK: %s' % e, file=sys.stderr)
+
+	return res
+
 
 class lnk_file(object):
+	# Compatibility wrapper exposing the result of parse() as attributes
 	def __init__(self, fhandle=None, indata=None, debug=False):
 		self.define_static()
 
@@ -22,69 +502,39 @@ class lnk_file(object):
 			self.indata = indata
 
 		self.debug = debug
-		self.lnk_header = {}
-
-		self.linkFlag = {
-			'HasTargetIDList': False,
-			'HasLinkInfo': False,
-			'HasName': False,
-			'HasRelativePath': False,
-			'HasWorkingDir': False,
-			'HasArguments': False,
-			'HasIconLocation': False,
-			'IsUnicode': False,
-			'ForceNoLinkInfo': False,
-			'HasExpString': False,
-			'RunInSeparateProcess': False,
-			'Reserved0': False,
-			'HasDarwinID': False,
-			'RunAsUser': False,
-			'HasExpIcon': False,
-			'NoPidlAlias': False,
-			'Reserved1': False,
-			'RunWithShimLayer': False,
-			'ForceNoLinkTrack': False,
-			'EnableTargetMetadata': False,
-			'DisableLinkPathTracking': False,
-			'DisableKnownFolderTracking': False,
-			'DisableKnownFolderAlias': False,
-			'AllowLinkToLink': False,
-			'UnaliasOnSave': False,
-			'PreferEnvironmentPath': False,
-			'KeepLocalIDListForUNCTarget': False,
-		}
-		self.fileFlag = {
-			'FILE_ATTRIBUTE_READONLY': False,
-			'FILE_ATTRIBUTE_HIDDEN': False,
-			'FILE_ATTRIBUTE_SYSTEM': False,
-			'Reserved, not used by the LNK format': False,
-			'FILE_ATTRIBUTE_DIRECTORY': False,
-			'FILE_ATTRIBUTE_ARCHIVE': False,
-			'FILE_ATTRIBUTE_DEVICE': False,
-			'FILE_ATTRIBUTE_NORMAL': False,
-			'FILE_ATTRIBUTE_TEMPORARY': False,
-			'FILE_ATTRIBUTE_SPARSE_FILE': False,
-			'FILE_ATTRIBUTE_REPARSE_POINT': False,
-			'FILE_ATTRIBUTE_COMPRESSED': False,
-			'FILE_ATTRIBUTE_OFFLINE': False,
-			'FILE_ATTRIBUTE_NOT_CONTENT_INDEXED': False,
-			'FILE_ATTRIBUTE_ENCRYPTED': False,
-			'Unknown (seen on Windows 95 FAT)': False,
-			'FILE_ATTRIBUTE_VIRTUAL': False,
-		}
-
-		self.targets = {
-			'size': 0,
-			'items': [],
-		}
-
-		self.loc_information = {}
-		self.data = {}
-		self.extraBlocks = {}
 
 		self.process()
 		self.define_common()
 
+	@classmethod
+	def from_result(cls, res, debug=False):
+		# Wrap a result produced elsewhere (e.g. decoded from a worker process)
+		lnk = cls.__new__(cls)
+		lnk.define_static()
+		lnk.indata = None
+		lnk.debug = debug
+		lnk.load_result(res)
+		lnk.define_common()
+		return lnk
+
+	def process(self):
+		res = parse(self.indata, debug=self.debug)
+		if not res['valid_header']:
+			print('Failed Header Check', file=sys.stderr)
+		self.load_result(res)
+
+	def load_result(self, res):
+		self.lnk_header = res['header']
+		self.linkFlag = res['link_flags']
+		self.fileFlag = res['file_flags']
+		self.targets = res['target']
+		self.loc_information = res['link_info']
+		self.data = res['data']
+		self.extraBlocks = res['extra']
+		self.overlay = res['overlay']
+		# Where the LNK was read from when it came out of an archive
+		self.source = res.get('source', {})
+
 	def define_common(self):
 		try:
 			out = ''
@@ -113,9 +563,7 @@ class lnk_file(object):
 			return ''
 
 	def define_static(self):
-		# Define static constents used within the LNK format
-
-		# Each MAGIC string refernces a function for processing
+		# Each MAGIC string refernces a method storing the block on this instance
 		self.EXTRA_SIGS = {
 			'a0000001': self.parse_environment_block,
 			'a0000002': self.parse_console_block,
@@ -128,192 +576,26 @@ class lnk_file(object):
 			'a0000009': self.parse_metadata_block,
 			'a000000b': self.parse_knownFolder_block,
 			'a000000c': self.parse_shellItem_block,
+			'a000000a': self.parse_vistaIDList_block,
 		}
+		self.DRIVE_TYPES = DRIVE_TYPES
+		self.HOTKEY_VALUES = HOTKEY_VALUES
+		self.WINDOWSTYLES = WINDOWSTYLES
 
-		self.DRIVE_TYPES = [
-			'DRIVE_UNKNOWN',
-			'DRIVE_NO_ROOT_DIR',
-			'DRIVE_REMOVABLE',
-			'DRIVE_FIXED',
-			'DRIVE_REMOTE',
-			'DRIVE_CDROM',
-			'DRIVE_RAMDISK',
-		]
-		self.HOTKEY_VALUES = {
-			'\x00': 'UNSET',
-			'\x01': 'HOTKEYF_SHIFT',
-			'\x02': 'HOTKEYF_CONTROL',
-			'\x03': 'HOTKEYF_ALT',
-		}
-		self.WINDOWSTYLES = [
-			'SW_HIDE',
-			'SW_NORMAL',
-			'SW_SHOWMINIMIZED',
-			'SW_MAXIMIZE ',
-			'SW_SHOWNOACTIVATE',
-			'SW_SHOW',
-			'SW_MINIMIZE',
-			'SW_SHOWMINNOACTIVE',
-			'SW_SHOWNA',
-			'SW_RESTORE',
-			'SW_SHOWDEFAULT',
-		]
-
-	@staticmethod
-	def clean_line(rstring):
-		return ''.join(chr(i) for i in rstring if 128 > i > 20)
-
-	def parse_lnk_header(self):
-		# Parse the LNK file header
-		try:
-			# Header always starts with { 4c 00 00 00 } and is the size of the header
-			self.lnk_header['header_size'] = struct.unpack('<I', self.indata[:4])[0]
-
-			lnk_header = self.indata[:self.lnk_header['header_size']]
-
-			self.lnk_header['guid'] = lnk_header[4:20].hex()
-
-			self.lnk_header['rlinkFlags'] = struct.unpack('<i', lnk_header[20:24])[0]
-			self.lnk_header['rfileFlags'] = struct.unpack('<i', lnk_header[24:28])[0]
-
-			self.lnk_header['creation_time'] = struct.unpack('<q', lnk_header[28:36])[0]
-			self.lnk_header['accessed_time'] = struct.unpack('<q', lnk_header[36:44])[0]
-			self.lnk_header['modified_time'] = struct.unpack('<q', lnk_header[44:52])[0]
+	clean_line = staticmethod(clean_line)
 
-			self.lnk_header['file_size'] = struct.unpack('<i', lnk_header[52:56])[0]
-			self.lnk_header['rfile_size'] = lnk_header[52:56].hex()
+	# The methods below delegate to the module level parsers and store the
+	# result on the instance; process() itself goes through parse()
 
-			self.lnk_header['icon_index'] = struct.unpack('<I', lnk_header[56:60])[0]
-			try:
-				if struct.unpack('<i', lnk_header[60:64])[0] < len(self.WINDOWSTYLES):
-					self.lnk_header['windowstyle'] = self.WINDOWSTYLES[
-						struct.unpack('<i', lnk_header[60:64])[0]]
-				else:
-					self.lnk_header['windowstyle'] = struct.unpack('<i', lnk_header[60:64])[0]
-			except Exception as e:
-				if self.debug:
-					print('Error Parsing WindowStyle in Header: %s' % e)
-				self.lnk_header['windowstyle'] = struct.unpack('<i', lnk_header[60:64])[0]
-
-			try:
-				self.lnk_header['hotkey'] = '%s - %s {0x%s}' % (
-					self.HOTKEY_VALUES[chr(struct.unpack('<B', lnk_header[65:66])[0])],
-					self.clean_line(struct.unpack('<B', lnk_header[64:65])),
-					lnk_header[64:66].hex()
-				)
-
-				self.lnk_header['rhotkey'] = struct.unpack('<H', lnk_header[64:66])[0]
-			except Exception as e:
-				if self.debug:
-					print('Exception parsing HOTKEY part of header: %s' % e)
-					print(lnk_header[65:66].hex())
-				self.lnk_header['hotkey'] = struct.unpack('<H', lnk_header[64:66])[0]
-
-			self.lnk_header['reserved0'] = struct.unpack('<H', lnk_header[66:68])[0]
-			self.lnk_header['reserved1'] = struct.unpack('<i', lnk_header[68:72])[0]
-			self.lnk_header['reserved2'] = struct.unpack('<i', lnk_header[72:76])[0]
-		except Exception as e:
-			if self.debug:
-				print('Exception parsing LNK Header: %s' % e)
-			return False
-
-		if self.lnk_header['header_size'] == 76:
-			return True
+	def parse_lnk_header(self):
+		return parse_lnk_header(self.indata, 0, self.lnk_header, self.debug)
 
 	def parse_link_flags(self):
-		if self.lnk_header['rlinkFlags'] & 0x00000001:
-			self.linkFlag['HasTargetIDList'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00000002:
-			self.linkFlag['HasLinkInfo'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00000004:
-			self.linkFlag['HasName'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00000008:
-			self.linkFlag['HasRelativePath'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00000010:
-			self.linkFlag['HasWorkingDir'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00000020:
-			self.linkFlag['HasArguments'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00000040:
-			self.linkFlag['HasIconLocation'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00000080:
-			self.linkFlag['IsUnicode'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00000100:
-			self.linkFlag['ForceNoLinkInfo'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00000200:
-			self.linkFlag['HasExpString'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00000400:
-			self.linkFlag['RunInSeparateProcess'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00000800:
-			self.linkFlag['Reserved0'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00001000:
-			self.linkFlag['HasDarwinID'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00002000:
-			self.linkFlag['RunAsUser'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00004000:
-			self.linkFlag['HasExpIcon'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00008000:
-			self.linkFlag['NoPidlAlias'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00010000:
-			self.linkFlag['Reserved1'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00020000:
-			self.linkFlag['RunWithShimLayer'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00040000:
-			self.linkFlag['ForceNoLinkTrack'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00080000:
-			self.linkFlag['EnableTargetMetadata'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00100000:
-			self.linkFlag['DisableLinkPathTracking'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00200000:
-			self.linkFlag['DisableKnownFolderTracking'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00400000:
-			self.linkFlag['DisableKnownFolderAlias'] = True
-		if self.lnk_header['rlinkFlags'] & 0x00800000:
-			self.linkFlag['AllowLinkToLink'] = True
-		if self.lnk_header['rlinkFlags'] & 0x01000000:
-			self.linkFlag['UnaliasOnSave'] = True
-		if self.lnk_header['rlinkFlags'] & 0x02000000:
-			self.linkFlag['PreferEnvironmentPath'] = True
-		if self.lnk_header['rlinkFlags'] & 0x04000000:
-			self.linkFlag['KeepLocalIDListForUNCTarget'] = True
-
+		self.linkFlag = parse_flags(self.lnk_header['rlinkFlags'], LINK_FLAGS)
 		self.lnk_header['linkFlags'] = self.enabled_flags_to_list(self.linkFlag)
 
 	def parse_file_flags(self):
-		if self.lnk_header['rfileFlags'] & 0x00000001:
-			self.fileFlag['FILE_ATTRIBUTE_READONLY'] = True
-		if self.lnk_header['rfileFlags'] & 0x00000002:
-			self.fileFlag['FILE_ATTRIBUTE_HIDDEN'] = True
-		if self.lnk_header['rfileFlags'] & 0x00000004:
-			self.fileFlag['FILE_ATTRIBUTE_SYSTEM'] = True
-		if self.lnk_header['rfileFlags'] & 0x00000008:
-			self.fileFlag['Reserved, not used by the LNK format'] = True
-		if self.lnk_header['rfileFlags'] & 0x00000010:
-			self.fileFlag['FILE_ATTRIBUTE_DIRECTORY'] = True
-		if self.lnk_header['rfileFlags'] & 0x00000020:
-			self.fileFlag['FILE_ATTRIBUTE_ARCHIVE'] = True
-		if self.lnk_header['rfileFlags'] & 0x00000040:
-			self.fileFlag['FILE_ATTRIBUTE_DEVICE'] = True
-		if self.lnk_header['rfileFlags'] & 0x00000080:
-			self.fileFlag['FILE_ATTRIBUTE_NORMAL'] = True
-		if self.lnk_header['rfileFlags'] & 0x00000100:
-			self.fileFlag['FILE_ATTRIBUTE_TEMPORARY'] = True
-		if self.lnk_header['rfileFlags'] & 0x00000200:
-			self.fileFlag['FILE_ATTRIBUTE_SPARSE_FILE'] = True
-		if self.lnk_header['rfileFlags'] & 0x00000400:
-			self.fileFlag['FILE_ATTRIBUTE_REPARSE_POINT'] = True
-		if self.lnk_header['rfileFlags'] & 0x00000800:
-			self.fileFlag['FILE_ATTRIBUTE_COMPRESSED'] = True
-		if self.lnk_header['rfileFlags'] & 0x00001000:
-			self.fileFlag['FILE_ATTRIBUTE_OFFLINE'] = True
-		if self.lnk_header['rfileFlags'] & 0x00002000:
-			self.fileFlag['FILE_ATTRIBUTE_NOT_CONTENT_INDEXED'] = True
-		if self.lnk_header['rfileFlags'] & 0x00004000:
-			self.fileFlag['FILE_ATTRIBUTE_ENCRYPTED'] = True
-		if self.lnk_header['rfileFlags'] & 0x00008000:
-			self.fileFlag['Unknown (seen on Windows 95 FAT)'] = True
-		if self.lnk_header['rfileFlags'] & 0x00010000:
-			self.fileFlag['FILE_ATTRIBUTE_VIRTUAL'] = True
-
+		self.fileFlag = parse_flags(self.lnk_header['rfileFlags'], FILE_FLAGS)
 		self.lnk_header['fileFlags'] = self.enabled_flags_to_list(self.fileFlag)
 
 	def parse_link_information(self):
@@ -338,234 +620,54 @@ class lnk_file(object):
 				'type': struct.unpack('<B', self.indata[index + 2: index + 3])[0],
 			}
 			index += 3
-
-			#           self.targets['items'].append( self.indata[index: index + ItemID['size']].replace('\x00','') )
-			#           print('[%s] %s' % (ItemID['size'], hex(ItemID['type']) )#, self.indata[index: index + ItemID['size']].replace('\x00','') ))
-			#           print(self.indata[ index: index + ItemID['size'] ].hex()[:50])
 			index += ItemID['size']
 
-	#           print(self.indata[index + 2: index + 2 + ItemID['size']].replace('\x00',''))
-
-	def process(self):
-		index = 0
-		if not self.parse_lnk_header():
-			print('Failed Header Check')
-
-		self.parse_link_flags()
-		self.parse_file_flags()
-		index += self.lnk_header['header_size']
-
-		# Parse ID List
-		if self.linkFlag['HasTargetIDList']:
-			try:
-				self.targets['size'] = struct.unpack('<H', self.indata[index: index + 2])[0]
-				index += 2
-				if self.debug:
-					self.parse_targets(index)
-				index += self.targets['size']
-			except Exception as e:
-				if self.debug:
-					print('Exception parsing TargetIDList: %s' % e)
-				return False
-
-		if self.linkFlag['HasLinkInfo'] and self.linkFlag['ForceNoLinkInfo'] == False:
-			try:
-				self.loc_information = {
-					'LinkInfoSize': struct.unpack('<i', self.indata[index: index + 4])[0],
-					'LinkInfoHeaderSize': struct.unpack('<i', self.indata[index + 4: index + 8])[0],
-					'LinkInfoFlags': struct.unpack('<i', self.indata[index + 8: index + 12])[0],
-					'VolumeIDOffset': struct.unpack('<i', self.indata[index + 12: index + 16])[0],
-					'LocalBasePathOffset': struct.unpack('<i', self.indata[index + 16: index + 20])[0],
-					'CommonNetworkRelativeLinkOffset': struct.unpack('<i', self.indata[index + 20: index + 24])[0],
-					'CommonPathSuffixOffset': struct.unpack('<i', self.indata[index + 24: index + 28])[0],
-				}
-
-				if self.loc_information['LinkInfoFlags'] & 0x0001:
-					if self.loc_information['LinkInfoHeaderSize'] >= 36:
-						self.loc_information['o_LocalBasePathOffsetUnicode'] = \
-								struct.unpack('<i', self.indata[index + 28: index + 32])[0]
-						local_index = index + self.loc_information['o_LocalBasePathOffsetUnicode']
-						self.loc_information['o_LocalBasePathUnicode'] = \
-								struct.unpack('<i', self.indata[local_index: local_index + 4])[0]
-					else:
-						local_index = index + self.loc_information['LocalBasePathOffset']
-						self.loc_information['LocalBasePath'] = self.read_string(local_index)
-
-					local_index = index + self.loc_information['VolumeIDOffset']
-					self.loc_information['location'] = 'VolumeIDAndLocalBasePath'
-					self.loc_information['VolumeIDAndLocalBasePath'] = {
-						'VolumeIDSize':
-							struct.unpack('<i', self.indata[local_index + 0: local_index + 4])[0],
-						'rDriveType':
-							struct.unpack('<i', self.indata[local_index + 4: local_index + 8])[0],
-						'DriveSerialNumber': hex(
-							struct.unpack('<i', self.indata[local_index + 8: local_index + 12])[0]),
-						'VolumeLabelOffset':
-							struct.unpack('<i', self.indata[local_index + 12: local_index + 16])[0],
-					}
-
-					if self.loc_information['VolumeIDAndLocalBasePath']['rDriveType'] < len(self.DRIVE_TYPES):
-						self.loc_information['VolumeIDAndLocalBasePath']['DriveType'] = self.DRIVE_TYPES[self.loc_information['VolumeIDAndLocalBasePath']['rDriveType']]
-
-					if self.loc_information['VolumeIDAndLocalBasePath']['VolumeLabelOffset'] != 20:
-						length = self.loc_information['VolumeIDAndLocalBasePath']['VolumeIDSize'] - self.loc_information['VolumeIDAndLocalBasePath']['VolumeLabelOffset']
-						local_index = index + self.loc_information['VolumeIDOffset'] + self.loc_information['VolumeIDAndLocalBasePath']['VolumeLabelOffset']
-						self.loc_information['VolumeIDAndLocalBasePath']['VolumeLabel'] = self.clean_line(self.indata[local_index: local_index + length].replace(b'\x00', b''))
-					else:
-						self.loc_information['VolumeIDAndLocalBasePath']['o_VolumeLabelOffsetUnicode'] = struct.unpack('<i', self.indata[local_index + 16: local_index + 20])[0]
-						local_index = index + self.loc_information['VolumeIDOffset'] + self.loc_information['VolumeIDAndLocalBasePath']['o_VolumeLabelOffsetUnicode']
-						self.loc_information['VolumeIDAndLocalBasePath']['o_VolumeLabelUnicode'] = struct.unpack('<i', self.indata[local_index: local_index + 4])[0]
-
-				elif self.loc_information['LinkInfoFlags'] & 0x0002:
-					if self.loc_information['LinkInfoHeaderSize'] >= 36:
-						self.loc_information['o_CommonPathSuffixOffsetUnicode'] = \
-								struct.unpack('<i', self.indata[index + 28: index + 32])[0]
-						local_index = index + self.loc_information['o_CommonPathSuffixOffsetUnicode']
-						self.loc_information['o_CommonPathSuffixUnicode'] = struct.unpack('<i', self.indata[local_index: local_index + 4])[0]
-					else:
-						local_index = index + self.loc_information['CommonPathSuffixOffset']
-						self.loc_information['CommonPathSuffix'] = \
-								struct.unpack('<i', self.indata[local_index: local_index + 4])[0]
-
-					local_index = index + self.loc_information['CommonNetworkRelativeLinkOffset']
-					self.loc_information['location'] = 'CommonNetworkRelativeLinkAndPathSuffix'
-					self.loc_information['CommonNetworkRelativeLinkAndPathSuffix'] = {
-						'CommonNetworkRelativeLinkSize':
-							struct.unpack('<i', self.indata[local_index + 0: local_index + 4])[0],
-						'CommonNetworkRelativeLinkFlags':
-							struct.unpack('<i', self.indata[local_index + 4: local_index + 8])[0],
-						'NetNameOffset':
-							struct.unpack('<i', self.indata[local_index + 8: local_index + 12])[0],
-						'DeviceNameOffset':
-							struct.unpack('<i', self.indata[local_index + 12: local_index + 16])[0],
-						'NetworkProviderType':
-							struct.unpack('<i', self.indata[local_index + 16: local_index + 20])[0],
-					}
-
-					if self.loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_NetNameOffset'] > 20:
-						self.loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_NetNameOffsetUnicode'] = \
-						struct.unpack('<i', self.indata[local_index + 20: index + 24])[0]
-						local_index = index + self.loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_NetNameOffsetUnicode']
-						self.loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_NetNameOffsetUnicode'] = \
-							struct.unpack('<i', self.indata[local_index: local_index + 4])[0]
-
-						self.loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_DeviceNameOffsetUnicode'] = \
-						struct.unpack('<i', self.indata[local_index + 24: index + 28])[0]
-						local_index = self.loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_DeviceNameOffsetUnicode']
-						self.loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_DeviceNameOffsetUnicode'] = \
-							struct.unpack('<i', self.indata[local_index: local_index + 4])[0]
-					else:
-						local_index = index + self.loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_NetNameOffset']
-						self.loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_NetNameOffset'] = \
-							struct.unpack('<i', self.indata[local_index: local_index + 4])[0]
-
-						local_index = self.loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_DeviceNameOffset']
-						self.loc_information['CommonNetworkRelativeLinkAndPathSuffix']['o_DeviceNameOffset'] = \
-							struct.unpack('<i', self.indata[local_index: local_index + 4])[0]
-
-				index += (self.loc_information['LinkInfoSize'])
-
-			except Exception as e:
-				if self.debug:
-					print('Exception parsing Location information: %s' % e)
-				return False
-
-			try:
-				u_mult = 1
-				if self.linkFlag['IsUnicode']:
-					u_mult = 2
-
-				if self.linkFlag['HasName']:
-					self.data['description'] = self.read_stringData(index, u_mult)
-
-				if self.linkFlag['HasRelativePath']:
-					index, self.data['relativePath'] = self.read_stringData(index, u_mult)
-
-				if self.linkFlag['HasWorkingDir']:
-					index, self.data['workingDirectory'] = self.read_stringData(index, u_mult)
-
-				if self.linkFlag['HasArguments']:
-					index, self.data['commandLineArguments'] = self.read_stringData(index, u_mult)
-
-				if self.linkFlag['HasIconLocation']:
-					index, self.data['iconLocation'] = self.read_stringData(index, u_mult)
-
-			except Exception as e:
-				if self.debug:
-					print('Exception in parsing data: %s' % e)
-				return False
-
-			try:
-				while index <= len(self.indata) - 10:
-					try:
-						size = struct.unpack('<I', self.indata[index: index + 4])[0]
-						sig = str(hex(struct.unpack('<I', self.indata[index + 4: index + 8])[0]))[2:]
-						self.EXTRA_SIGS[sig](index, size)
-
-						index += (size)
-					except Exception as e:
-						if self.debug:
-							print('Exception in EXTRABLOCK Parsing: %s ' % e)
-						index = len(self.data)
-						break
-			except Exception as e:
-				if self.debug:
-					print('Exception in EXTRABLOCK: %s' % e)
+	def store_block(self, parser, index, size):
+		name, block = parser(self.indata, index, size)
+		self.extraBlocks[name] = block
 
 	def parse_environment_block(self, index, size):
-		self.extraBlocks['ENVIRONMENTAL_VARIABLES_LOCATION_BLOCK'] = {}
-		self.extraBlocks['ENVIRONMENTAL_VARIABLES_LOCATION_BLOCK']['size'] = size
-		self.extraBlocks['ENVIRONMENTAL_VARIABLES_LOCATION_BLOCK'][
-			'variable_location'] = self.clean_line(self.indata[index + 8: index + 8 + size])
+		self.store_block(parse_environment_block, index, size)
 
 	def parse_console_block(self, index, size):
-		self.extraBlocks['CONSOLE_PROPERTIES_BLOCK'] = {}
+		self.store_block(parse_console_block, index, size)
 
 	def parse_distributedTracker_block(self, index, size):
-		self.extraBlocks['DISTRIBUTED_LINK_TRACKER_BLOCK'] = {}
-		self.extraBlocks['DISTRIBUTED_LINK_TRACKER_BLOCK']['size'] = \
-			struct.unpack('<I', self.indata[index + 8: index + 12])[0]
-		self.extraBlocks['DISTRIBUTED_LINK_TRACKER_BLOCK']['version'] = \
-			struct.unpack('<I', self.indata[index + 12: index + 16])[0]
-
-		self.extraBlocks['DISTRIBUTED_LINK_TRACKER_BLOCK']['machine_identifier'] = self.clean_line(
-			self.indata[index + 16: index + 32])
-
-		self.extraBlocks['DISTRIBUTED_LINK_TRACKER_BLOCK']['droid_volume_identifier'] = self.indata[
-																						index + 32: index + 48].hex()
-		self.extraBlocks['DISTRIBUTED_LINK_TRACKER_BLOCK']['droid_file_identifier'] = self.indata[
-																					  index + 48: index + 64].hex()
-		self.extraBlocks['DISTRIBUTED_LINK_TRACKER_BLOCK'][
-			'birth_droid_volume_identifier'] = self.indata[index + 64: index + 80].hex()
-		self.extraBlocks['DISTRIBUTED_LINK_TRACKER_BLOCK'][
-			'birth_droid_file_identifier'] = self.indata[index + 80: index + 96].hex()
+		self.store_block(parse_distributedTracker_block, index, size)
 
 	def parse_codepage_block(self, index, size):
-		self.extraBlocks['CONSOLE_CODEPAGE_BLOCK'] = {}
+		self.store_block(parse_codepage_block, index, size)
 
 	def parse_specialFolder_block(self, index, size):
-		self.extraBlocks['SPECIAL_FOLDER_LOCATION_BLOCK'] = {}
+		self.store_block(parse_specialFolder_block, index, size)
 
 	def parse_darwin_block(self, index, size):
-		self.extraBlocks['DARWIN_BLOCK'] = {}
+		self.store_block(parse_darwin_block, index, size)
 
 	def parse_icon_block(self, index, size):
-		self.extraBlocks['ICON_LOCATION_BLOCK'] = {}
+		self.store_block(parse_icon_block, index, size)
 
 	def parse_shimLayer_block(self, index, size):
-		self.extraBlocks['SHIM_LAYER_BLOCK'] = {}
+		self.store_block(parse_shimLayer_block, index, size)
 
 	def parse_metadata_block(self, index, size):
-		self.extraBlocks['METADATA_PRPERTIES_BLOCK'] = {}
+		self.store_block(parse_metadata_block, index, size)
 
 	def parse_knownFolder_block(self, index, size):
-		self.extraBlocks['KNOWN_FOLDER_LOCATION_BLOCK'] = {}
+		self.store_block(parse_knownFolder_block, index, size)
 
 	def parse_shellItem_block(self, index, size):
-		self.extraBlocks['SHELL_ITEM_IDENTIFIER_BLOCK'] = {}
+		self.store_block(parse_shellItem_block, index, size)
+
+	def parse_vistaIDList_block(self, index, size):
+		self.store_block(parse_vistaIDList_block, index, size)
 
 	def print_lnk_file(self):
 		print('Windows Shortcut Information:')
+		if self.source:
+			print('\tArchive: %s' % self.source['archive'])
+			print('\tMember: %s' % self.source['member'])
+			print('')
 		print('\tLink Flags: %s - (%s)' % (self.format_linkFlags(), self.lnk_header['rlinkFlags']))
 		print('\tFile Flags: %s - (%s)' % (self.format_fileFlags(), self.lnk_header['rfileFlags']))
 		print('')
@@ -577,7 +679,7 @@ class lnk_file(object):
 		except:
 			print('\tProblem Parsing Timestamps')
 		print(
-			'\tFile Size: %s (r: %s)' % (str(self.lnk_header['file_size']), str(len(self.indata))))
+			'\tFile Size: %s (r: %s)' % (str(self.lnk_header['file_size']), str(self.get_size())))
 		print('\tIcon Index: %s ' % (str(self.lnk_header['icon_index'])))
 		print('\tWindow Style: %s ' % (str(self.lnk_header['windowstyle'])))
 		print('\tHotKey: %s ' % (str(self.lnk_header['hotkey'])))
@@ -594,29 +696,33 @@ class lnk_file(object):
 			for block in self.extraBlocks[enabled]:
 				print('\t\t\t[%s] %s' % (block, self.extraBlocks[enabled][block]))
 
+		if self.overlay.get('size'):
+			print('')
+			print('\tOVERLAY:')
+			for key in self.overlay:
+				print('\t\t[%s] %s' % (key, self.overlay[key]))
+
+	def get_size(self):
+		if 'size' in self.source:
+			return self.source['size']
+		return len(self.indata)
+
+	def scan_overlay(self):
+		# Hash, entropy and magic over the overlay, read in chunks from indata
+		if self.overlay.get('size') and self.indata is not None:
+			self.overlay.update(scan_overlay(self.indata, self.overlay['offset'], self.overlay['size']))
+		return self.overlay
+
 	def ms_time_to_unix_time(self, time):
 		return datetime.datetime.fromtimestamp(time / 10000000.0 - 11644473600).strftime('%Y-%m-%d %H:%M:%S')
 
 	def read_string(self, index):
-		result = ''
-		while self.indata[index] != 0x00:
-			result += chr(self.indata[index])
-			index += 1
-		return result
+		return read_string(self.indata, index)
 
 	def read_stringData(self, index, u_mult):
-		string_size = struct.unpack('<H', self.indata[index: index + 2])[0] * u_mult
-		string = self.clean_line(self.indata[index + 2: index + 2 + string_size].replace(b'\x00', b''))
-		new_index = index + string_size + 2
-		return new_index, string
-
-	@staticmethod
-	def enabled_flags_to_list(flags):
-		enabled = []
-		for flag in flags:
-			if flags[flag]:
-				enabled.append(flag)
-		return enabled
+		return read_stringData(self.indata, index, u_mult)
+
+	enabled_flags_to_list = staticmethod(enabled_flags_to_list)
 
 	def format_linkFlags(self):
 		enabled = self.enabled_flags_to_list(self.linkFlag)
@@ -639,7 +745,15 @@ class lnk_file(object):
 			print(out)
 
 	def print_json(self, print_all=False):
-		res = {'header': self.lnk_header, 'data': self.data, 'target': self.targets, 'link_info': self.loc_information, 'extra': self.extraBlocks}
+		print(json.dumps(self.get_json(print_all), indent=4, separators=(',', ': ')))
+
+	def get_json(self, print_all=False):
+		# Work on a copy so the parsed values (e.g. raw timestamps) are untouched
+		res = copy.deepcopy({'header': self.lnk_header, 'data': self.data, 'target': self.targets, 'link_info': self.loc_information, 'extra': self.extraBlocks})
+		if self.overlay.get('size'):
+			res['overlay'] = self.overlay
+		if self.source:
+			res['source'] = self.source
 
 		if 'creation_time' in res['header']:
 			res['header']['creation_time'] = self.ms_time_to_unix_time(res['header']['creation_time'])
@@ -649,26 +763,26 @@ class lnk_file(object):
 			res['header']['modified_time'] = self.ms_time_to_unix_time(res['header']['modified_time'])
 
 		if not print_all:
-			res['header'].pop('header_size')
-			res['header'].pop('reserved0')
-			res['header'].pop('reserved1')
-			res['header'].pop('reserved2')
-			res['target'].pop('size')
-			res['link_info'].pop('LinkInfoSize')
-			res['link_info'].pop('LinkInfoHeaderSize')
-			res['link_info'].pop('VolumeIDOffset')
-			res['link_info'].pop('LocalBasePathOffset')
-			res['link_info'].pop('CommonNetworkRelativeLinkOffset')
-			res['link_info'].pop('CommonPathSuffixOffset')
+			res['header'].pop('header_size', None)
+			res['header'].pop('reserved0', None)
+			res['header'].pop('reserved1', None)
+			res['header'].pop('reserved2', None)
+			res['target'].pop('size', None)
+			res['link_info'].pop('LinkInfoSize', None)
+			res['link_info'].pop('LinkInfoHeaderSize', None)
+			res['link_info'].pop('VolumeIDOffset', None)
+			res['link_info'].pop('LocalBasePathOffset', None)
+			res['link_info'].pop('CommonNetworkRelativeLinkOffset', None)
+			res['link_info'].pop('CommonPathSuffixOffset', None)
 			if 'VolumeIDAndLocalBasePath' in res['link_info']:
-				res['link_info']['VolumeIDAndLocalBasePath'].pop('VolumeIDSize')
-				res['link_info']['VolumeIDAndLocalBasePath'].pop('VolumeLabelOffset')
+				res['link_info']['VolumeIDAndLocalBasePath'].pop('VolumeIDSize', None)
+				res['link_info']['VolumeIDAndLocalBasePath'].pop('VolumeLabelOffset', None)
 			if 'CommonNetworkRelativeLinkAndPathSuffix' in res['link_info']:
-				res['link_info']['CommonNetworkRelativeLinkAndPathSuffix'].pop('CommonNetworkRelativeLinkSize')
-				res['link_info']['CommonNetworkRelativeLinkAndPathSuffix'].pop('NetNameOffset')
-				res['link_info']['CommonNetworkRelativeLinkAndPathSuffix'].pop('DeviceNameOffset')
+				res['link_info']['CommonNetworkRelativeLinkAndPathSuffix'].pop('CommonNetworkRelativeLinkSize', None)
+				res['link_info']['CommonNetworkRelativeLinkAndPathSuffix'].pop('NetNameOffset', None)
+				res['link_info']['CommonNetworkRelativeLinkAndPathSuffix'].pop('DeviceNameOffset', None)
 
-		print(json.dumps(res, indent=4, separators=(',', ': ')))
+		return res
 
 def test_case(filename):
 	with open(filename, 'rb') as file:
@@ -688,14 +802,23 @@ def main():
 							help='print all extracted data in JSON (i.e. offsets and sizes)')
 	arg_parser.add_argument('-D', '--debug', action='store_true',
 							help='print debug info')
+	arg_parser.add_argument('-o', '--overlay', action='store_true',
+							help='hash and identify data appended after the TerminalBlock')
 	args = arg_parser.parse_args()
 
 	with open(args.file, 'rb') as file:
-		lnk = lnk_file(fhandle=file, debug=args.debug)
-		if args.json:
-			lnk.print_json(args.json_debug)
-		else:
-			lnk.print_lnk_file()
+		if not os.fstat(file.fileno()).st_size:
+			sys.exit('Error: %s is empty' % args.file)
+
+		# Map the file so large overlays are never read into memory
+		with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as indata:
+			lnk = lnk_file(indata=indata, debug=args.debug)
+			if args.overlay:
+				lnk.scan_overlay()
+			if args.json:
+				lnk.print_json(args.json_debug)
+			else:
+				lnk.print_lnk_file()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# Parse LNK files directly from zip and tar evidence bundles without
+# extracting them to disk
+
+import os
+import sys
+import tarfile
+import zipfile
+import itertools
+import collections
+import concurrent.futures
+
+from . import parse
+from .overlay import scan_overlay
+from .transport import result_batch, decode_batch
+
+
+# Maximum number of bytes read from a single member
+MAX_MEMBER_SIZE = 0x100000
+
+# Number of zip members handed to a worker at once
+CHUNK_SIZE = 256
+
+# Every LNK file starts with a HeaderSize of 0x0000004C
+LNK_MAGIC = b'L\x00\x00\x00'
+
+# Opened once per worker process by init_zip_worker()
+worker_zip = None
+
+
+def archive_type(path):
+	if zipfile.is_zipfile(path):
+		return 'zip'
+	if tarfile.is_tarfile(path):
+		return 'tar'
+	return None
+
+
+def parse_member(path, name, size, fhandle, max_size=MAX_MEMBER_SIZE, overlay=False, debug=False):
+	# Streams at most max_size bytes of a member into parse(); returns None
+	# for members that are not LNK files
+	try:
+		indata = fhandle.read(max_size)
+		if not indata.startswith(LNK_MAGIC):
+			return None
+
+		res = parse(indata, debug=debug)
+	except Exception as e:
+		if debug:
+			print('Exception parsing %s:%s: %s' % (path, name, e), file=sys.stderr)
+		return None
+
+	# Truncated or corrupt headers leave nothing worth reporting
+	if not res['valid_header']:
+		if debug:
+			print('Failed Header Check %s:%s' % (path, name), file=sys.stderr)
+		return None
+
+	res['source'] = {
+		'archive': path,
+		'member': name,
+		'size': size,
+		'truncated': size > len(indata),
+	}
+
+	if res['overlay']:
+		# Report the full overlay even if it was not read
+		res['overlay']['size'] = size - res['overlay']['offset']
+		if overlay and not res['source']['truncated'] and res['overlay']['size']:
+			res['overlay'].update(scan_overlay(indata, res['overlay']['offset'], res['overlay']['size']))
+
+	return res
+
+
+def iter_zip(zf, path, indexes, max_size, overlay, debug):
+	infolist = zf.infolist()
+	for index in indexes:
+		info = infolist[index]
+		try:
+			fhandle = zf.open(info)
+		except Exception as e:
+			# Encrypted or unsupported compression
+			if debug:
+				print('Exception opening %s:%s: %s' % (path, info.filename, e), file=sys.stderr)
+			continue
+		with fhandle:
+			res = parse_member(path, info.filename, info.file_size, fhandle, max_size, overlay, debug)
+		if res:
+			yield res
+
+
+def init_zip_worker(path):
+	global worker_zip
+	worker_zip = zipfile.ZipFile(path)
+
+
+def parse_zip_chunk(path, indexes, max_size, overlay, debug):
+	batch = result_batch()
+	for res in iter_zip(worker_zip, path, indexes, max_size, overlay, debug):
+		batch.append(res)
+	return batch.to_bytes()
+
+
+def chunks(iterable, size):
+	iterator = iter(iterable)
+	while True:
+		chunk = list(itertools.islice(iterator, size))
+		if not chunk:
+			return
+		yield chunk
+
+
+def parse_zip(path, max_size=MAX_MEMBER_SIZE, workers=None, overlay=False, debug=False):
+	if workers is None:
+		workers = os.cpu_count() or 1
+	if workers < 1:
+		raise ValueError('workers must be at least 1')
+
+	with zipfile.ZipFile(path) as zf:
+		indexes = [index for index, info in enumerate(zf.infolist()) if not info.is_dir()]
+
+		if workers == 1:
+			for res in iter_zip(zf, path, indexes, max_size, overlay, debug):
+				yield res
+			return
+
+	# Zip members can be read independently, so each worker opens the
+	# archive once and parses whole chunks of members.  Only a small window
+	# of chunks is in flight so finished batches do not pile up in memory.
+	with concurrent.futures.ProcessPoolExecutor(
+			max_workers=workers, initializer=init_zip_worker, initargs=(path,)) as executor:
+		pending = collections.deque()
+		for chunk in chunks(indexes, CHUNK_SIZE):
+			if len(pending) >= 2 * workers:
+				for res in decode_batch(pending.popleft().result()):
+					yield res
+			pending.append(executor.submit(parse_zip_chunk, path, chunk, max_size, overlay, debug))
+		while pending:
+			for res in decode_batch(pending.popleft().result()):
+				yield res
+
+
+def parse_tar(path, max_size=MAX_MEMBER_SIZE, overlay=False, debug=False):
+	# Compressed tar streams can only be read front to back, so members are
+	# parsed in order as they are streamed
+	with tarfile.open(path, 'r|*') as tf:
+		for info in tf:
+			if not info.isfile():
+				continue
+			with tf.extractfile(info) as fhandle:
+				res = parse_member(path, info.name, info.size, fhandle, max_size, overlay, debug)
+			if res:
+				yield res
+
+
+def parse_archive(path, max_size=MAX_MEMBER_SIZE, workers=None, overlay=False, debug=False):
+	# Yields a parse() result, with an added 'source' entry, for every LNK
+	# member of a zip or tar archive
+	kind = archive_type(path)
+	if kind == 'zip':
+		return parse_zip(path, max_size, workers, overlay, debug)
+	if kind == 'tar':
+		return parse_tar(path, max_size, overlay, debug)
+	raise ValueError('%s is not a zip or tar archive' % path)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# Builder fingerprinting for parsed LNK files
+
+import hashlib
+import sqlite3
+
+
+# Ordered list of builder artifacts extracted from a parsed lnk_file
+FEATURES = [
+	'machine_identifier',
+	'birth_droid_volume_identifier',
+	'birth_droid_file_identifier',
+	'drive_serial_number',
+	'volume_label',
+	'creation_time',
+	'accessed_time',
+	'modified_time',
+	'extra_blocks',
+]
+
+# Features stored in the inverted index.  The ExtraData block layout is
+# shared by most shortcuts, so it only contributes to the fingerprint hash.
+PIVOT_FEATURES = [name for name in FEATURES if name != 'extra_blocks']
+
+TIMESTAMPS = ('creation_time', 'accessed_time', 'modified_time')
+
+
+def builder_features(lnk):
+	# Returns a stable, ordered list of (feature, value) pairs for an lnk_file
+	# or a lnkfile.parse() result.  Missing artifacts are reported as None so
+	# the vector always has the same shape.
+	if isinstance(lnk, dict):
+		header, link_info, extra = lnk['header'], lnk['link_info'], lnk['extra']
+	else:
+		header, link_info, extra = lnk.lnk_header, lnk.loc_information, lnk.extraBlocks
+
+	# Only raw FILETIME values give a stable vector
+	for name in TIMESTAMPS:
+		if name in header and not isinstance(header[name], int):
+			raise ValueError('%s is not a FILETIME value: %r' % (name, header[name]))
+
+	tracker = extra.get('DISTRIBUTED_LINK_TRACKER_BLOCK', {})
+	volume = link_info.get('VolumeIDAndLocalBasePath', {})
+
+	values = {
+		'machine_identifier': tracker.get('machine_identifier'),
+		'birth_droid_volume_identifier': tracker.get('birth_droid_volume_identifier'),
+		'birth_droid_file_identifier': tracker.get('birth_droid_file_identifier'),
+		'drive_serial_number': volume.get('DriveSerialNumber'),
+		'volume_label': volume.get('VolumeLabel'),
+		'creation_time': header.get('creation_time'),
+		'accessed_time': header.get('accessed_time'),
+		'modified_time': header.get('modified_time'),
+		# Set and order of the ExtraData blocks
+		'extra_blocks': ','.join(extra) or None,
+	}
+
+	features = []
+	for name in FEATURES:
+		value = values[name]
+		# Zeroed timestamps and empty strings are not builder artifacts
+		if value in ('', 0):
+			value = None
+		if value is not None:
+			value = str(value)
+		features.append((name, value))
+	return features
+
+
+def fingerprint(lnk):
+	# SHA256 over the feature vector; identical builders produce identical hashes
+	return hash_features(builder_features(lnk))
+
+
+def hash_features(features):
+	out = '\n'.join('%s=%s' % (name, '' if value is None else value) for name, value in features)
+	return hashlib.sha256(out.encode('utf-8')).hexdigest()
+
+
+class fingerprint_index(object):
+	# On-disk inverted index of builder artifacts -> samples, backed by SQLite.
+	# Lookups go through the (feature, value) index so pivots do not rescan.
+	def __init__(self, path):
+		self.path = path
+		self.db = sqlite3.connect(path)
+		self.db.executescript('''
+			CREATE TABLE IF NOT EXISTS samples (
+				sample TEXT PRIMARY KEY,
+				fingerprint TEXT NOT NULL
+			);
+			CREATE TABLE IF NOT EXISTS features (
+				feature TEXT NOT NULL,
+				value TEXT NOT NULL,
+				sample TEXT NOT NULL,
+				PRIMARY KEY (feature, value, sample)
+			) WITHOUT ROWID;
+			CREATE INDEX IF NOT EXISTS samples_fingerprint ON samples (fingerprint);
+			CREATE INDEX IF NOT EXISTS features_sample ON features (sample);
+		''')
+
+	def add(self, sample, lnk):
+		# Indexes one sample in its own transaction; returns its fingerprint
+		with self.db:
+			return self.add_sample(sample, lnk)
+
+	def add_many(self, samples):
+		# Indexes an iterable of (sample, lnk) pairs in a single transaction;
+		# returns the number of samples added
+		count = 0
+		with self.db:
+			for sample, lnk in samples:
+				self.add_sample(sample, lnk)
+				count += 1
+		return count
+
+	def add_sample(self, sample, lnk):
+		# Writes one sample without committing; use add() or add_many()
+		features = builder_features(lnk)
+		digest = hash_features(features)
+		self.db.execute('DELETE FROM features WHERE sample = ?', (sample,))
+		self.db.execute('INSERT OR REPLACE INTO samples VALUES (?, ?)', (sample, digest))
+		self.db.executemany(
+			'INSERT OR IGNORE INTO features VALUES (?, ?, ?)',
+			[(name, value, sample) for name, value in features
+				if value is not None and name in PIVOT_FEATURES])
+		return digest
+
+	def samples_with(self, feature, value, limit=None):
+		cur = self.db.execute(
+			'SELECT sample FROM features WHERE feature = ? AND value = ? LIMIT ?',
+			(feature, str(value), -1 if limit is None else limit))
+		return [row[0] for row in cur]
+
+	def samples_with_fingerprint(self, digest):
+		cur = self.db.execute('SELECT sample FROM samples WHERE fingerprint = ?', (digest,))
+		return [row[0] for row in cur]
+
+	def related(self, lnk, exclude=None, features=None, limit=None):
+		# Returns {sample: [(feature, value), ...]} for indexed samples sharing
+		# at least one of the given builder artifacts with lnk, stopping once
+		# limit samples have been found
+		if features is None:
+			features = PIVOT_FEATURES
+		res = {}
+		for name, value in builder_features(lnk):
+			if value is None or name not in features:
+				continue
+			query_limit = None if limit is None else limit + 1
+			for sample in self.samples_with(name, value, query_limit):
+				if sample == exclude:
+					continue
+				if sample not in res and limit is not None and len(res) >= limit:
+					break
+				res.setdefault(sample, []).append((name, value))
+		return res
+
+	def close(self):
+		self.db.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# Compact binary encoding of lnkfile.parse() results for passing between
+# processes without pickling nested dicts.
+#
+# Each result is split into its shape (dict keys, list lengths and value
+# types) and its scalar values.  Results from one parser share a handful
+# of shapes, so a batch stores every distinct shape once and the values
+# column-wise:
+#
+#   'LNKB', version (B), count (I)
+#   shapes     length (I) + marshal list of shape tuples
+#   records    count * shape id (<I)
+#   ints       length (I) + n * <q
+#   floats     length (I) + n * <d
+#   bools      length (I) + n * B
+#   strings    length (I) + n * <I index into the string table
+#   table      length (I) + n * <I character lengths,
+#              length (I) + UTF-8 text of the distinct strings joined
+#
+# The flag dicts and lists that parse() derives from rlinkFlags and
+# rfileFlags are stored as the raw value and expanded from a cache.  Flag
+# names, window styles and hex fields repeat across results, so each
+# distinct string is decoded once.  Decoding unpacks each column in one
+# call and rebuilds results with a builder compiled once per shape, so
+# there is no per-value parsing.
+
+import struct
+import marshal
+import itertools
+
+from . import LINK_FLAGS, FILE_FLAGS, parse_flags, enabled_flags_to_list
+
+
+VERSION = 2
+BATCH_MAGIC = b'LNKB'
+
+BATCH = struct.Struct('<4sBI')
+LENGTH = struct.Struct('<I')
+
+# Shape builders are reused across batches; the cache is dropped when it
+# grows past this many shapes
+MAX_BUILDERS = 4096
+builders = {}
+
+
+class flag_cache(dict):
+	# Raw flags value -> flags dict, or its list of enabled names
+	def __init__(self, table, enabled=False):
+		self.table = table
+		self.enabled = enabled
+
+	def __missing__(self, value):
+		if len(self) >= MAX_BUILDERS:
+			self.clear()
+		flags = parse_flags(value, self.table)
+		self[value] = enabled_flags_to_list(flags) if self.enabled else flags
+		return self[value]
+
+
+# Builders copy from these for derived nodes, so every result gets its own
+# dicts and lists
+EXPANDERS = (
+	flag_cache(LINK_FLAGS),
+	flag_cache(LINK_FLAGS, enabled=True),
+	flag_cache(FILE_FLAGS),
+	flag_cache(FILE_FLAGS, enabled=True),
+)
+
+# (header raw key, result key, header key, index of the dict expander) for
+# every flag value parse() derives from the header
+DERIVED_FLAGS = [
+	('rlinkFlags', 'link_flags', 'linkFlags', 0),
+	('rfileFlags', 'file_flags', 'fileFlags', 2),
+]
+
+
+def derived_values(res):
+	# Maps id() of the flag values in res that match their raw header value
+	# to (expander, raw value)
+	derived = {}
+	header = res.get('header')
+	if not isinstance(header, dict):
+		return derived
+	for raw_name, name, header_name, expander in DERIVED_FLAGS:
+		value = header.get(raw_name)
+		if type(value) is not int:
+			continue
+		if res.get(name) == EXPANDERS[expander][value]:
+			derived[id(res[name])] = (expander, value)
+		if header.get(header_name) == EXPANDERS[expander + 1][value]:
+			derived[id(header[header_name])] = (expander + 1, value)
+	return derived
+
+
+def flatten(value, columns, derived):
+	# Appends the scalars of value to their columns and returns its shape.
+	# columns maps a scalar type to (append, shape).
+	column = columns.get(type(value))
+	if column is not None:
+		column[0](value)
+		return column[1]
+	if value is None:
+		return 'n'
+	if id(value) in derived:
+		expander, raw = derived[id(value)]
+		columns[int][0](raw)
+		return ('x', expander)
+	if isinstance(value, dict):
+		items = []
+		for key, item in value.items():
+			column = columns.get(type(item))
+			if column is None:
+				items.append((key, flatten(item, columns, derived)))
+			else:
+				column[0](item)
+				items.append((key, column[1]))
+		return ('d', tuple(items))
+	if isinstance(value, (list, tuple)):
+		return ('l' if isinstance(value, list) else 't', tuple([flatten(item, columns, derived) for item in value]))
+	# Subclasses of the scalar types (e.g. enums)
+	for kind in (bool, int, float, str):
+		if isinstance(value, kind):
+			return flatten(kind(value), columns, derived)
+	raise ValueError('Cannot encode value of type %s' % type(value).__name__)
+
+
+def builder_source(shape, counts):
+	# Python expression rebuilding a value of this shape from the columns
+	if shape == 'n':
+		return 'None'
+	if shape in ('i', 'f', 's', 'b'):
+		column = {'i': 'I', 'f': 'F', 's': 'S', 'b': 'B'}[shape]
+		counts[shape] += 1
+		return '%s[%d]' % (column, counts[shape] - 1)
+	if isinstance(shape, tuple) and len(shape) == 2:
+		kind, items = shape
+		if kind == 'x' and items in range(len(EXPANDERS)):
+			counts['i'] += 1
+			copy = 'list' if EXPANDERS[items].enabled else 'dict'
+			return '%s(X[%d][I[%d]])' % (copy, items, counts['i'] - 1)
+		if kind == 'd':
+			parts = []
+			for key, item in items:
+				if not isinstance(key, str):
+					raise ValueError('Invalid shape key %r' % (key,))
+				parts.append('%r: %s' % (key, builder_source(item, counts)))
+			return '{%s}' % ', '.join(parts)
+		if kind == 'l':
+			return '[%s]' % ', '.join(builder_source(item, counts) for item in items)
+		if kind == 't':
+			return '(%s)' % ''.join(builder_source(item, counts) + ', ' for item in items)
+	raise ValueError('Invalid shape %r' % (shape,))
+
+
+def get_builder(shape):
+	# Returns (function, ints, floats, strings, bools) for a shape
+	if shape not in builders:
+		if len(builders) >= MAX_BUILDERS:
+			builders.clear()
+		counts = {'i': 0, 'f': 0, 's': 0, 'b': 0}
+		# Only str keys (via repr) and fixed column references reach the
+		# source, so untrusted shapes cannot inject code
+		source = 'lambda I, F, S, B: ' + builder_source(shape, counts)
+		build = eval(source, {'X': EXPANDERS, 'dict': dict, 'list': list})
+		builders[shape] = (build, counts['i'], counts['f'], counts['s'], counts['b'])
+	return builders[shape]
+
+
+def pack_column(fmt, values):
+	data = struct.pack('<%d%s' % (len(values), fmt), *values)
+	return LENGTH.pack(len(data)) + data
+
+
+def unpack_column(fmt, size, buf, pos):
+	length = LENGTH.unpack_from(buf, pos)[0]
+	pos += LENGTH.size
+	return struct.unpack_from('<%d%s' % (length // size, fmt), buf, pos), pos + length
+
+
+class result_batch(object):
+	# Accumulates results in a worker so they can be shipped to the parent
+	# in a single message or copied into shared memory
+	def __init__(self):
+		self.shapes = {}
+		self.records = []
+		self.ints = []
+		self.floats = []
+		self.strings = []
+		self.bools = []
+		self.columns = {
+			bool: (self.bools.append, 'b'),
+			int: (self.ints.append, 'i'),
+			float: (self.floats.append, 'f'),
+			str: (self.strings.append, 's'),
+		}
+
+	def __len__(self):
+		return len(self.records)
+
+	def append(self, res):
+		shape = flatten(res, self.columns, derived_values(res))
+		self.records.append(self.shapes.setdefault(shape, len(self.shapes)))
+
+	def to_bytes(self):
+		shapes = marshal.dumps(list(self.shapes), 4)
+		table = {}
+		strings = [table.setdefault(string, len(table)) for string in self.strings]
+		text = ''.join(table).encode('utf-8', 'surrogatepass')
+		return b''.join([
+			BATCH.pack(BATCH_MAGIC, VERSION, len(self.records)),
+			LENGTH.pack(len(shapes)),
+			shapes,
+			struct.pack('<%dI' % len(self.records), *self.records),
+			pack_column('q', self.ints),
+			pack_column('d', self.floats),
+			pack_column('B', self.bools),
+			pack_column('I', strings),
+			pack_column('I', [len(string) for string in table]),
+			LENGTH.pack(len(text)),
+			text,
+		])
+
+	def write_into(self, buf, offset=0):
+		# Writes the batch into a writable buffer; returns the bytes written
+		data = self.to_bytes()
+		if len(buf) - offset < len(data):
+			raise ValueError('Buffer too small for batch of %d bytes' % len(data))
+		buf[offset:offset + len(data)] = data
+		return len(data)
+
+
+def decode_batch(buf, offset=0):
+	# Accepts bytes or any buffer (e.g. a shared memory view).  Only decode
+	# batches produced by these workers; marshal is not hardened.
+	buf = memoryview(buf)
+	magic, version, count = BATCH.unpack_from(buf, offset)
+	if magic != BATCH_MAGIC:
+		raise ValueError('Not a result batch')
+	if version != VERSION:
+		raise ValueError('Unsupported batch version %d' % version)
+	pos = offset + BATCH.size
+
+	length = LENGTH.unpack_from(buf, pos)[0]
+	pos += LENGTH.size
+	shapes = [get_builder(shape) for shape in marshal.loads(buf[pos:pos + length])]
+	pos += length
+
+	records = struct.unpack_from('<%dI' % count, buf, pos)
+	pos += count * 4
+	ints, pos = unpack_column('q', 8, buf, pos)
+	floats, pos = unpack_column('d', 8, buf, pos)
+	bools, pos = unpack_column('B', 1, buf, pos)
+	bools = list(map(bool, bools))
+	strings, pos = unpack_column('I', 4, buf, pos)
+	lengths, pos = unpack_column('I', 4, buf, pos)
+	length = LENGTH.unpack_from(buf, pos)[0]
+	pos += LENGTH.size
+	text = str(buf[pos:pos + length], 'utf-8', 'surrogatepass')
+
+	offsets = list(itertools.accumulate((0,) + lengths))
+	table = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+	strings = list(map(table.__getitem__, strings))
+
+	results = []
+	i = f = s = b = 0
+	for shape in records:
+		build, ni, nf, ns, nb = shapes[shape]
+		results.append(build(ints[i:i + ni], floats[f:f + nf], strings[s:s + ns], bools[b:b + nb]))
+		i += ni
+		f += nf
+		s += ns
+		b += nb
+	return results
+
+
+def encode(res):
+	batch = result_batch()
+	batch.append(res)
+	return batch.to_bytes()
+
+
+def decode(buf):
+	return decode_batch(buf)[0]
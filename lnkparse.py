@@ -6,11 +6,22 @@ __description__ = 'Windows Shortcut file (LNK) parser'
 __author__ = 'Silas Cutler'
 __version__ = '0.2.1'
 
+import os
 import sys
+import json
+import mmap
 import lnkfile
+from lnkfile import archive
 import argparse
 
 
+def positive_int(value):
+	value = int(value)
+	if value < 1:
+		raise argparse.ArgumentTypeError('must be at least 1')
+	return value
+
+
 def main():
 	arg_parser = argparse.ArgumentParser(description=__description__)
 	arg_parser.add_argument('-f', '--file', dest='file', required=True,
@@ -21,14 +32,47 @@ def main():
 							help='print all extracted data in JSON (i.e. offsets and sizes)')
 	arg_parser.add_argument('-D', '--debug', action='store_true',
 							help='print debug info')
+	arg_parser.add_argument('-o', '--overlay', action='store_true',
+							help='hash and identify data appended after the TerminalBlock')
+	arg_parser.add_argument('-m', '--max_size', type=positive_int, default=archive.MAX_MEMBER_SIZE,
+							help='maximum number of bytes read from each archive member')
+	arg_parser.add_argument('-w', '--workers', type=positive_int, default=None,
+							help='number of processes used to parse zip archives')
 	args = arg_parser.parse_args()
 
 	with open(args.file, 'rb') as file:
-		lnk = lnkfile.lnk_file(fhandle=file, debug=args.debug)
-		if args.json:
-			lnk.print_json(args.json_debug)
-		else:
-			lnk.print_lnk_file()
+		is_lnk = file.read(4) == archive.LNK_MAGIC
+
+	# Zip and tar bundles are parsed member by member without extracting them.
+	# JSON output is one object per line so it can be streamed.
+	if not is_lnk and archive.archive_type(args.file):
+		for res in archive.parse_archive(args.file, args.max_size, args.workers, args.overlay, args.debug):
+			# One bad member must not stop the rest of the archive
+			try:
+				lnk = lnkfile.lnk_file.from_result(res, debug=args.debug)
+				if args.json:
+					out = json.dumps(lnk.get_json(args.json_debug))
+					print(out)
+				else:
+					lnk.print_lnk_file()
+			except Exception as e:
+				print('Error processing %s:%s: %s' % (
+					res['source']['archive'], res['source']['member'], e), file=sys.stderr)
+		return
+
+	with open(args.file, 'rb') as file:
+		if not os.fstat(file.fileno()).st_size:
+			sys.exit('Error: %s is empty' % args.file)
+
+		# Map the file so large overlays are never read into memory
+		with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as indata:
+			lnk = lnkfile.lnk_file(indata=indata, debug=args.debug)
+			if args.overlay:
+				lnk.scan_overlay()
+			if args.json:
+				lnk.print_json(args.json_debug)
+			else:
+				lnk.print_lnk_file()
 
 
 if __name__ == "__main__":